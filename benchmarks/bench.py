@@ -0,0 +1,365 @@
+"""
+Benchmarks for the polar-python codec and device hot paths.
+
+Every case decodes or encodes a batch of synthetic packets and reports:
+
+- packets/s and samples/s, the median of several timed repeats, along with
+  the range of packets/s across the repeats as a noise estimate;
+- realtime factor, how many streams at each supported sample rate one core
+  can keep up with, derived from samples/s;
+- peak bytes per packet, the mean of the memory allocated at the peak of each
+  call above what was allocated before it, as traced by tracemalloc;
+- retained blocks per packet, the number of memory blocks still allocated
+  per packet once the batch is processed with all results kept alive.
+
+Results are written to ``benchmarks/results/<label>.json``. Two result files
+can be compared with ``--compare``, which only flags a speed change when the
+ranges of the two runs do not overlap.
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Tuple
+
+from polar_python import PolarDevice, constants, utils
+from polar_python.simulator import (
+    DEFAULT_STREAM_SETTINGS,
+    SimulatedClient,
+    build_acc_frame,
+    build_ecg_frame,
+    build_heartrate_data,
+    build_pmd_response,
+)
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+# Payload bytes available in one PMD data notification at the H10's MTU of 232
+PMD_PAYLOAD_SIZE = 232 - 3 - 10
+
+ECG_SAMPLE_RATES = [130]
+ACC_SAMPLE_RATES = [25, 50, 100, 200]
+ACC_FRAME_TYPES = {0x00: 1, 0x01: 2, 0x02: 3}
+
+Case = Tuple[str, Callable[[object], object], List[object], float, List[int]]
+
+
+def ecg_packets(count: int, rng: random.Random) -> Tuple[List[bytearray], int]:
+    samples = PMD_PAYLOAD_SIZE // 3
+    timestamp = constants.TIMESTAMP_OFFSET
+    packets = [
+        build_ecg_frame(
+            timestamp + i, [rng.randint(-2000, 2000) for _ in range(samples)]
+        )
+        for i in range(count)
+    ]
+    return packets, samples
+
+
+def acc_packets(
+    count: int, rng: random.Random, frame_type: int
+) -> Tuple[List[bytearray], int]:
+    size = ACC_FRAME_TYPES[frame_type]
+    samples = PMD_PAYLOAD_SIZE // (3 * size)
+    limit = 2 ** (8 * size - 1) - 1
+    timestamp = constants.TIMESTAMP_OFFSET
+    packets = [
+        build_acc_frame(
+            timestamp + i,
+            [
+                tuple(rng.randint(-limit, limit) for _ in range(3))
+                for _ in range(samples)
+            ],
+            frame_type,
+        )
+        for i in range(count)
+    ]
+    return packets, samples
+
+
+def heartrate_packets(count: int, rng: random.Random, rr_count: int) -> List[bytearray]:
+    return [
+        build_heartrate_data(
+            rng.randint(40, 200), [rng.uniform(300, 1500) for _ in range(rr_count)]
+        )
+        for _ in range(count)
+    ]
+
+
+def build_cases(count: int, seed: int) -> List[Case]:
+    """Build every case as (name, function, inputs, samples, sample rates)."""
+    rng = random.Random(seed)
+    cases: List[Case] = []
+
+    # Decoding cost does not depend on the sample rate, so each frame type is
+    # measured once and the realtime factor is reported for every rate
+    ecg, ecg_samples = ecg_packets(count, rng)
+    cases.append(
+        (
+            "parse_ecg_data",
+            lambda packet: utils.parse_ecg_data(packet, 0),
+            ecg,
+            ecg_samples,
+            ECG_SAMPLE_RATES,
+        )
+    )
+    cases.append(
+        (
+            "parse_bluetooth_data[ECG]",
+            utils.parse_bluetooth_data,
+            ecg,
+            ecg_samples,
+            ECG_SAMPLE_RATES,
+        )
+    )
+
+    for frame_type in ACC_FRAME_TYPES:
+        acc, acc_samples = acc_packets(count, rng, frame_type)
+        cases.append(
+            (
+                f"parse_acc_data[type={frame_type}]",
+                lambda packet, frame_type=frame_type: utils.parse_acc_data(
+                    packet, 0, frame_type
+                ),
+                acc,
+                acc_samples,
+                ACC_SAMPLE_RATES,
+            )
+        )
+        cases.append(
+            (
+                f"parse_bluetooth_data[ACC,type={frame_type}]",
+                utils.parse_bluetooth_data,
+                acc,
+                acc_samples,
+                ACC_SAMPLE_RATES,
+            )
+        )
+
+    for measurement_type, settings in DEFAULT_STREAM_SETTINGS.items():
+        index = constants.PMD_MEASUREMENT_TYPES.index(measurement_type)
+        response = build_pmd_response(0x01, index, settings=settings)
+        cases.append(
+            (
+                f"parse_pmd_data[{measurement_type}]",
+                utils.parse_pmd_data,
+                [response] * count,
+                0,
+                [],
+            )
+        )
+        requested = constants.MeasurementSettings(
+            measurement_type=measurement_type,
+            settings=[
+                constants.SettingType(
+                    type=setting.type, array_length=1, values=setting.values[:1]
+                )
+                for setting in settings
+            ],
+        )
+        cases.append(
+            (
+                f"build_measurement_settings[{measurement_type}]",
+                utils.build_measurement_settings,
+                [requested] * count,
+                0,
+                [],
+            )
+        )
+
+    for rr_count in (0, 1, 4):
+        cases.append(
+            (
+                f"parse_heartrate_data[rr={rr_count}]",
+                utils.parse_heartrate_data,
+                heartrate_packets(count, rng, rr_count),
+                rr_count,
+                [],
+            )
+        )
+
+    received = []
+    device = PolarDevice(
+        "SIM", received.append, received.append, client=SimulatedClient()
+    )
+    acc, acc_samples = acc_packets(count, rng, 0x01)
+    stream = []
+    for ecg_packet, acc_packet in zip(ecg, acc):
+        stream.append((device._handle_pmd_data, ecg_packet, ecg_samples))
+        stream.append((device._handle_pmd_data, acc_packet, acc_samples))
+    for hr_packet in heartrate_packets(count // 50 or 1, rng, 1):
+        stream.append((device._handle_heartrate_measurement, hr_packet, 1))
+    rng.shuffle(stream)
+    stream = stream[:count]
+    stream_samples = sum(samples for _, _, samples in stream) / len(stream)
+
+    def handle(item):
+        handler, packet, _ = item
+        handler(None, packet)
+
+    cases.append(("PolarDevice[ECG+ACC+HR]", handle, stream, stream_samples, []))
+    return cases
+
+
+def measure(function: Callable, inputs: List[object], repeats: int) -> Dict:
+    """Time and trace one case."""
+    rates = []
+    for _ in range(repeats):
+        gc.collect()
+        started = time.perf_counter()
+        for item in inputs:
+            function(item)
+        rates.append(len(inputs) / (time.perf_counter() - started))
+
+    gc.collect()
+    tracemalloc.start()
+    blocks = len(tracemalloc.take_snapshot().traces)
+    results = []
+    peak_bytes = 0
+    for item in inputs:
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        results.append(function(item))
+        _, peak = tracemalloc.get_traced_memory()
+        peak_bytes += peak - before
+    blocks = len(tracemalloc.take_snapshot().traces) - blocks
+    tracemalloc.stop()
+    del results
+
+    return {
+        "packets_per_second": statistics.median(rates),
+        "packets_per_second_range": [min(rates), max(rates)],
+        "peak_bytes_per_packet": peak_bytes / len(inputs),
+        "retained_blocks_per_packet": blocks / len(inputs),
+    }
+
+
+def default_label() -> str:
+    try:
+        return subprocess.run(
+            ["git", "describe", "--always", "--dirty"],
+            capture_output=True,
+            check=True,
+            text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return time.strftime("%Y%m%d-%H%M%S")
+
+
+def run(args) -> None:
+    results = {}
+    print(
+        f"{'case':<40} {'packets/s':>12} {'spread':>7} {'samples/s':>12} "
+        f"{'bytes/pkt':>10} {'blocks/pkt':>11}"
+    )
+    for name, function, inputs, samples, sample_rates in build_cases(
+        args.packets, args.seed
+    ):
+        if args.filter and args.filter not in name:
+            continue
+        result = measure(function, inputs, args.repeats)
+        result["samples_per_second"] = result["packets_per_second"] * samples
+        result["realtime_factors"] = {
+            str(sample_rate): result["samples_per_second"] / sample_rate
+            for sample_rate in sample_rates
+        }
+        results[name] = result
+        low, high = result["packets_per_second_range"]
+        spread = (high - low) / result["packets_per_second"]
+        print(
+            f"{name:<40} {result['packets_per_second']:>12.0f} {spread:>7.1%} "
+            f"{result['samples_per_second']:>12.0f} "
+            f"{result['peak_bytes_per_packet']:>10.0f} "
+            f"{result['retained_blocks_per_packet']:>11.1f}"
+        )
+        if sample_rates:
+            realtime = ", ".join(
+                f"{factor:.0f}x at {sample_rate} Hz"
+                for sample_rate, factor in result["realtime_factors"].items()
+            )
+            print(f"    realtime: {realtime}")
+
+    label = args.label or default_label()
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = os.path.join(RESULTS_DIR, f"{label}.json")
+    with open(path, "w", encoding="utf-8") as fh:
+        json.dump(
+            {
+                "label": label,
+                "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                "python": sys.version,
+                "platform": platform.platform(),
+                "packets": args.packets,
+                "repeats": args.repeats,
+                "seed": args.seed,
+                "results": results,
+            },
+            fh,
+            indent=2,
+        )
+    print(f"\nResults written to {path}")
+
+
+def compare(baseline_path: str, current_path: str) -> None:
+    with open(baseline_path, encoding="utf-8") as fh:
+        baseline = json.load(fh)
+    with open(current_path, encoding="utf-8") as fh:
+        current = json.load(fh)
+
+    print(f"{baseline['label']} -> {current['label']}")
+    print(
+        f"{'case':<40} {'packets/s':>12} {'change':>8} {'':<6} "
+        f"{'bytes/pkt':>10} {'change':>8}"
+    )
+    for name, result in current["results"].items():
+        previous = baseline["results"].get(name)
+        if previous is None or "packets_per_second_range" not in previous:
+            continue
+        speed = result["packets_per_second"] / previous["packets_per_second"] - 1
+        # Only changes beyond the spread of both runs' repeats are flagged
+        low, high = result["packets_per_second_range"]
+        previous_low, previous_high = previous["packets_per_second_range"]
+        if low > previous_high:
+            verdict = "faster"
+        elif high < previous_low:
+            verdict = "slower"
+        else:
+            verdict = "~"
+        peak_bytes = result["peak_bytes_per_packet"] - previous["peak_bytes_per_packet"]
+        print(
+            f"{name:<40} {result['packets_per_second']:>12.0f} {speed:>+8.1%} "
+            f"{verdict:<6} {result['peak_bytes_per_packet']:>10.0f} "
+            f"{peak_bytes:>+8.0f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark the polar-python codec and device hot paths."
+    )
+    parser.add_argument("--packets", type=int, default=2000)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--filter", help="Only run cases containing this string")
+    parser.add_argument("--label", help="Name of the results file")
+    parser.add_argument(
+        "--compare",
+        nargs=2,
+        metavar=("BASELINE", "CURRENT"),
+        help="Compare two results files instead of running",
+    )
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+    else:
+        run(args)
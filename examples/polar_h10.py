@@ -2,11 +2,10 @@ import asyncio
 import signal
 import threading
 from typing import Union
-from bleak import BleakScanner
 from rich.console import Console
 from rich import inspect
 
-from polar_python import PolarDevice, MeasurementSettings, SettingType, ECGData, ACCData, HRData
+from polar_python import discovery, exceptions, MeasurementSettings, SettingType, ECGData, ACCData, HRData
 
 # Initialize Rich Console
 console = Console()
@@ -26,19 +25,17 @@ async def main():
     Main function to connect to a Polar device, query its features,
     set measurement settings, and start data streaming.  
     """
-    # Find the Polar H10 device
-    device = await BleakScanner.find_device_by_filter(
-        lambda bd, ad: bd.name and "Polar H10" in bd.name, timeout=5
-    )
-    if device is None:
+    # Connect to the Polar H10 by its cached address, scanning only if needed
+    try:
+        polar_device = await discovery.connect("Polar H10")
+    except exceptions.ConnectionError:
         console.print("[bold red]Device not found[/bold red]")
         return
 
     # Inspect the device details
-    inspect(device)
+    inspect(polar_device.client)
 
-    # Establish connection to the Polar device
-    async with PolarDevice(device) as polar_device:
+    async with polar_device:
         # Query available features
         available_features = await polar_device.available_features()
         inspect(available_features)
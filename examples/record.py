@@ -3,12 +3,12 @@ import signal
 import threading
 import numpy
 from typing import Union
-from bleak import BleakScanner
 from rich.console import Console
 from rich import inspect
 
 from polar_python import (
-    PolarDevice,
+    discovery,
+    exceptions,
     MeasurementSettings,
     SettingType,
     ECGData,
@@ -42,16 +42,15 @@ def data_callback(data: Union[ECGData, ACCData]):
 
 
 async def main():
-    device = await BleakScanner.find_device_by_filter(
-        lambda bd, ad: bd.name and "Polar H10" in bd.name, timeout=5
-    )
-    if device is None:
+    try:
+        polar_device = await discovery.connect("Polar H10")
+    except exceptions.ConnectionError:
         console.print("[bold red]Device not found[/bold red]")
         return
 
-    inspect(device)
+    inspect(polar_device.client)
 
-    async with PolarDevice(device) as polar_device:
+    async with polar_device:
         available_features = await polar_device.available_features()
         inspect(available_features)
 
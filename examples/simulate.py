@@ -0,0 +1,104 @@
+import argparse
+import asyncio
+import statistics
+import time
+from typing import List, Union
+
+from rich.console import Console
+
+from polar_python import (
+    PolarDevice,
+    MeasurementSettings,
+    SettingType,
+    ECGData,
+    ACCData,
+)
+from polar_python.simulator import SimulatedClient
+
+console = Console()
+
+ecg_settings = MeasurementSettings(
+    measurement_type="ECG",
+    settings=[
+        SettingType(type="SAMPLE_RATE", array_length=1, values=[130]),
+        SettingType(type="RESOLUTION", array_length=1, values=[14]),
+    ],
+)
+
+acc_settings = MeasurementSettings(
+    measurement_type="ACC",
+    settings=[
+        SettingType(type="SAMPLE_RATE", array_length=1, values=[200]),
+        SettingType(type="RESOLUTION", array_length=1, values=[16]),
+        SettingType(type="RANGE", array_length=1, values=[2]),
+    ],
+)
+
+
+class Stats:
+    def __init__(self) -> None:
+        self.frames = 0
+        self.samples = 0
+        self.heartrates = 0
+        self.latencies: List[float] = []
+
+    def data_callback(self, data: Union[ECGData, ACCData]) -> None:
+        # Simulated device clocks follow host time, so the frame timestamp
+        # (time of the last sample) gives the end-to-end latency directly
+        self.latencies.append((time.time_ns() - data.timestamp) / 1e6)
+        self.frames += 1
+        self.samples += len(data.data)
+
+    def heartrate_callback(self, data) -> None:
+        self.heartrates += 1
+
+
+async def run_device(index: int, args, stats: Stats) -> SimulatedClient:
+    client = SimulatedClient(
+        address=f"SIM:{index:06d}", jitter=args.jitter, loss=args.loss, seed=index
+    )
+    async with PolarDevice(
+        client.address, stats.data_callback, stats.heartrate_callback, client=client
+    ) as polar_device:
+        await polar_device.start_stream(ecg_settings)
+        await polar_device.start_stream(acc_settings)
+        await polar_device.start_heartrate_stream()
+        await asyncio.sleep(args.duration)
+    return client
+
+
+async def main(args) -> None:
+    stats = Stats()
+    started = time.perf_counter()
+    clients = await asyncio.gather(
+        *(run_device(index, args, stats) for index in range(args.devices))
+    )
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(stats.latencies)
+    dropped = sum(client.notifications_dropped for client in clients)
+    console.print(f"[bold blue]Devices:[/bold blue] {args.devices}")
+    console.print(f"[bold blue]Frames/s:[/bold blue] {stats.frames / elapsed:.1f}")
+    console.print(f"[bold blue]Samples/s:[/bold blue] {stats.samples / elapsed:.1f}")
+    console.print(
+        f"[bold blue]Heart rate notifications:[/bold blue] {stats.heartrates}"
+    )
+    console.print(f"[bold blue]Dropped notifications:[/bold blue] {dropped}")
+    if latencies:
+        console.print(
+            f"[bold blue]Latency (ms):[/bold blue] "
+            f"median {statistics.median(latencies):.2f}, "
+            f"p99 {latencies[int(len(latencies) * 0.99)]:.2f}, "
+            f"max {latencies[-1]:.2f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Stream from simulated Polar devices and report throughput."
+    )
+    parser.add_argument("--devices", type=int, default=100)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--loss", type=float, default=0.0)
+    asyncio.run(main(parser.parse_args()))
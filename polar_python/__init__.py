@@ -1,5 +1,6 @@
 from .device import PolarDevice
 from .constants import MeasurementSettings, SettingType, ECGData, ACCData, HRData
+from .export import ParquetSink
 
 __all__ = [
     "PolarDevice",
@@ -8,4 +9,5 @@ __all__ = [
     "ECGData",
     "ACCData",
     "HRData",
+    "ParquetSink",
 ]
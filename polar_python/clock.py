@@ -0,0 +1,145 @@
+from typing import Optional
+
+# Half-life of past observations, in seconds of device time
+DEFAULT_HALF_LIFE: float = 300.0
+
+# Residuals beyond this many mean absolute residuals are down-weighted
+DEFAULT_HUBER_THRESHOLD: float = 3.0
+
+# Rate at which the latency floor is allowed to rise, in seconds per second
+DEFAULT_FLOOR_RELAXATION: float = 1e-4
+
+# Device time span, in seconds, needed before drift is estimated
+MIN_DRIFT_SPAN: float = 10.0
+
+# Smoothing factor of the residual scale and excess latency estimates
+SMOOTHING: float = 0.05
+
+
+class ClockModel:
+    def __init__(
+        self,
+        half_life: float = DEFAULT_HALF_LIFE,
+        huber_threshold: float = DEFAULT_HUBER_THRESHOLD,
+        floor_relaxation: float = DEFAULT_FLOOR_RELAXATION,
+    ) -> None:
+        """
+        Initialize an online model mapping device timestamps to host time.
+
+        The model fits ``host = offset + rate * device`` to pairs of
+        device timestamps and host receive times with an exponentially weighted,
+        Huber-weighted least squares fit that is updated in O(1) per pair.
+
+        Receive times lag the device clock by the transport latency, so the fit
+        is shifted down to the lower envelope of the residuals: host timestamps
+        estimate when a sample was taken, and the excess latency is the delay of
+        each frame above that envelope. A constant minimum delay shared by all
+        frames cannot be observed without a round trip, so host timestamps are
+        early by that delay and it is not part of the excess latency.
+
+        :param half_life: Half-life of past observations, in seconds of device time.
+        :param huber_threshold: Residuals beyond this many mean absolute residuals
+            are down-weighted.
+        :param floor_relaxation: Rate at which the latency floor may rise, so the
+            envelope can follow the fit, in seconds per second.
+        """
+        self.half_life = half_life
+        self.huber_threshold = huber_threshold
+        self.floor_relaxation = floor_relaxation
+        self.count = 0
+        self._device_origin = 0
+        self._host_origin = 0
+        self._last_x = 0.0
+        self._sw = 0.0
+        self._swx = 0.0
+        self._swy = 0.0
+        self._swxx = 0.0
+        self._swxy = 0.0
+        self._intercept = 0.0
+        self._slope = 1.0
+        self._scale: Optional[float] = None
+        self._floor: Optional[float] = None
+        self._excess_latency = 0.0
+
+    @property
+    def drift(self) -> float:
+        """Drift of the device clock, in parts per million, positive when it runs fast."""
+        return (1.0 / self._slope - 1.0) * 1e6
+
+    @property
+    def offset(self) -> int:
+        """Host minus device time at the latest observation, in nanoseconds."""
+        host = self._predict(self._last_x) + (self._floor or 0.0)
+        return (
+            self._host_origin - self._device_origin + int((host - self._last_x) * 1e9)
+        )
+
+    @property
+    def excess_latency(self) -> int:
+        """
+        Smoothed transport latency above the unobservable minimum delay, in
+        nanoseconds. This is not the end-to-end latency.
+        """
+        return int(self._excess_latency * 1e9)
+
+    def update(self, device_timestamp: int, host_timestamp: int) -> None:
+        """
+        Add a pair of a device timestamp and its host receive time, in nanoseconds.
+        """
+        if self.count == 0:
+            self._device_origin = device_timestamp
+            self._host_origin = host_timestamp
+        x = (device_timestamp - self._device_origin) / 1e9
+        y = (host_timestamp - self._host_origin) / 1e9
+        self.count += 1
+
+        residual = y - self._predict(x) if self.count > 1 else 0.0
+        weight = 1.0
+        if self._scale:
+            limit = self.huber_threshold * self._scale
+            if abs(residual) > limit:
+                weight = limit / abs(residual)
+
+        elapsed = max(0.0, x - self._last_x)
+        decay = 0.5 ** (elapsed / self.half_life)
+        self._sw = self._sw * decay + weight
+        self._swx = self._swx * decay + weight * x
+        self._swy = self._swy * decay + weight * y
+        self._swxx = self._swxx * decay + weight * x * x
+        self._swxy = self._swxy * decay + weight * x * y
+        self._last_x = max(self._last_x, x)
+        self._fit()
+
+        residual = y - self._predict(x)
+        self._scale = (
+            abs(residual)
+            if self._scale is None
+            else self._scale + SMOOTHING * (abs(residual) - self._scale)
+        )
+        if self._floor is None or residual < self._floor:
+            self._floor = residual
+        else:
+            self._floor += self.floor_relaxation * elapsed
+        self._excess_latency += SMOOTHING * (
+            residual - self._floor - self._excess_latency
+        )
+
+    def to_host(self, device_timestamp: int) -> int:
+        """Convert a device timestamp to host time, in nanoseconds."""
+        x = (device_timestamp - self._device_origin) / 1e9
+        host = self._predict(x) + (self._floor or 0.0)
+        return self._host_origin + int(host * 1e9)
+
+    def _predict(self, x: float) -> float:
+        return self._intercept + self._slope * x
+
+    def _fit(self) -> None:
+        mean_x = self._swx / self._sw
+        mean_y = self._swy / self._sw
+        variance = self._swxx / self._sw - mean_x * mean_x
+        if variance * 12.0 >= MIN_DRIFT_SPAN * MIN_DRIFT_SPAN:
+            covariance = self._swxy / self._sw - mean_x * mean_y
+            self._slope = covariance / variance
+        else:
+            self._slope = 1.0
+        self._intercept = mean_y - self._slope * mean_x
@@ -62,6 +62,7 @@ class ACCData:
 
     timestamp: int
     data: List[Tuple[int, int, int]]
+    host_timestamp: Optional[int] = None
 
 
 @dataclass
@@ -70,6 +71,7 @@ class ECGData:
 
     timestamp: int
     data: List[int]
+    host_timestamp: Optional[int] = None
 
 
 @dataclass
@@ -78,3 +80,4 @@ class HRData:
 
     heartrate: int
     rr_intervals: List[float]
+    host_timestamp: Optional[int] = None
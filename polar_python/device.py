@@ -1,10 +1,11 @@
 import asyncio
+import time
 from bleak import BleakClient
 from bleak.backends.device import BLEDevice
 from bleak.backends.characteristic import BleakGATTCharacteristic
-from typing import Union, Callable, List
+from typing import Union, Callable, List, Optional
 
-from . import constants, exceptions, utils
+from . import clock, constants, exceptions, utils
 
 
 class PolarDevice:
@@ -15,6 +16,7 @@ class PolarDevice:
             [Union[constants.ECGData, constants.ACCData]], None
         ] = None,
         heartrate_callback: Callable[[constants.HRData], None] = None,
+        client: Optional[BleakClient] = None,
     ) -> None:
         """
         Initialize the PolarDevice with a BLE address or device.
@@ -22,14 +24,30 @@ class PolarDevice:
         :param address_or_ble_device: The address or BLEDevice instance of the Polar device.
         :param data_callback: Callback function to handle data streams.
         :param heartrate_callback: Callback function to handle heart rate data.
+        :param client: Client to use instead of a BleakClient for the given address,
+            such as a ``polar_python.simulator.SimulatedClient``.
         """
-        self.client = BleakClient(address_or_ble_device)
+        self.client = (
+            client if client is not None else BleakClient(address_or_ble_device)
+        )
+        self.clock = clock.ClockModel()
         self._queue_pmd_control = asyncio.Queue()
         self._data_callback = data_callback
         self._heartrate_callback = heartrate_callback
 
+    @property
+    def excess_latency(self) -> int:
+        """
+        Estimated latency of PMD data frames above the minimum transport delay,
+        in nanoseconds. The minimum delay cannot be observed, so this is not the
+        end-to-end latency.
+        """
+        return self.clock.excess_latency
+
     async def connect(self) -> None:
-        """Connect to the Polar device."""
+        """Connect to the Polar device, unless it is already connected."""
+        if self.client.is_connected:
+            return
         try:
             await self.client.connect()
             await self.client.start_notify(
@@ -168,7 +186,10 @@ class PolarDevice:
         self, sender: BleakGATTCharacteristic, data: bytearray
     ) -> None:
         """Handle PMD data notifications."""
+        received_at = time.time_ns()
         parsed_data = utils.parse_bluetooth_data(data)
+        self.clock.update(parsed_data.timestamp, received_at)
+        parsed_data.host_timestamp = self.clock.to_host(parsed_data.timestamp)
         if self._data_callback:
             self._data_callback(parsed_data)
 
@@ -177,5 +198,6 @@ class PolarDevice:
     ) -> None:
         """Handle heart rate measurement notifications."""
         parsed_data = utils.parse_heartrate_data(data)
+        parsed_data.host_timestamp = time.time_ns()
         if self._heartrate_callback:
             self._heartrate_callback(parsed_data)
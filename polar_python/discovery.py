@@ -0,0 +1,273 @@
+import asyncio
+import json
+import os
+from bleak import BleakClient, BleakScanner
+from bleak.backends.device import BLEDevice
+from bleak.backends.scanner import AdvertisementData
+from typing import Callable, Dict, Iterable, List, Optional, Union
+
+from . import constants, exceptions
+from .device import PolarDevice
+
+# Name prefix advertised by Polar devices
+POLAR_NAME_PREFIX: str = "Polar"
+
+# Maximum seconds to scan for devices
+DEFAULT_SCAN_TIMEOUT: float = 5.0
+
+# Seconds to wait for a connection to a single device
+DEFAULT_CONNECT_TIMEOUT: float = 5.0
+
+
+def default_cache_path() -> str:
+    """Return the default path of the address cache."""
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return os.path.join(cache_home, "polar-python", "addresses.json")
+
+
+class AddressCache:
+    def __init__(self, path: Optional[str] = None) -> None:
+        """
+        Initialize a persisted mapping of device identifiers to BLE addresses.
+
+        :param path: Path of the JSON cache file, defaults to
+            ``$XDG_CACHE_HOME/polar-python/addresses.json``.
+        """
+        self.path = default_cache_path() if path is None else path
+        self._addresses: Dict[str, str] = {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as fh:
+                addresses = json.load(fh)
+            if isinstance(addresses, dict):
+                self._addresses = {
+                    str(identifier): str(address)
+                    for identifier, address in addresses.items()
+                }
+        except (OSError, ValueError):
+            pass
+
+    def __contains__(self, identifier: str) -> bool:
+        return identifier in self._addresses
+
+    def get(self, identifier: str) -> Optional[str]:
+        """Return the cached address of a device, if any."""
+        return self._addresses.get(identifier)
+
+    def set(self, identifier: str, address: str) -> None:
+        """Cache the address of a device."""
+        self._addresses[identifier] = address
+
+    def remove(self, identifier: str) -> None:
+        """Forget the address of a device."""
+        self._addresses.pop(identifier, None)
+
+    def save(self) -> None:
+        """Write the cache to disk."""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temporary_path = f"{self.path}.tmp"
+        with open(temporary_path, "w", encoding="utf-8") as fh:
+            json.dump(self._addresses, fh, indent=2, sort_keys=True)
+        os.replace(temporary_path, self.path)
+
+
+async def discover(
+    identifiers: Optional[Iterable[str]] = None,
+    timeout: float = DEFAULT_SCAN_TIMEOUT,
+    addresses: Optional[Dict[str, str]] = None,
+) -> Dict[str, BLEDevice]:
+    """
+    Find many Polar devices with a single scan.
+
+    Each identifier matches the device at its known address, if one is given, or
+    else the first device whose advertised name contains it, such as
+    ``"Polar H10"`` or a device ID like ``"ABCDEF12"``. When several identifiers
+    match a name, the most specific one takes the device: one the name ends
+    with, such as a device ID, before a longer one. The scan stops as soon as
+    every identifier is matched. An identifier whose known address is not seen
+    falls back to matching by name once the scan times out. Without identifiers,
+    every device whose name starts with ``"Polar"`` is returned, keyed by name,
+    after the full timeout.
+
+    :param identifiers: Identifiers of the devices to find.
+    :param timeout: Maximum number of seconds to scan.
+    :param addresses: Known addresses of some of the identifiers.
+    :return: The devices found, keyed by identifier.
+    """
+    pending = None if identifiers is None else list(dict.fromkeys(identifiers))
+    known = {
+        address.upper(): identifier
+        for identifier, address in (addresses or {}).items()
+        if pending is not None and identifier in pending
+    }
+    found: Dict[str, BLEDevice] = {}
+    fallbacks: Dict[str, BLEDevice] = {}
+    seen = set()
+    done = asyncio.Event()
+
+    def detection_callback(
+        device: BLEDevice, advertisement_data: AdvertisementData
+    ) -> None:
+        if device.address in seen:
+            return
+        name = advertisement_data.local_name or device.name or ""
+        if pending is None:
+            if name.startswith(POLAR_NAME_PREFIX):
+                found[name] = device
+                seen.add(device.address)
+            return
+
+        identifier = known.get(device.address.upper())
+        if identifier not in pending:
+            identifier = None
+            if not name or device.address.upper() in known:
+                return
+            # Generic identifiers like "Polar H10" would otherwise take devices
+            # that a device ID listed after them needs
+            candidates = sorted(
+                (candidate for candidate in pending if candidate in name),
+                key=lambda candidate: (name.endswith(candidate), len(candidate)),
+                reverse=True,
+            )
+            for candidate in candidates:
+                if candidate not in known.values():
+                    identifier = candidate
+                    break
+                # Identifiers with a known address prefer it, so only remember
+                # this device in case that address is never seen
+                fallbacks.setdefault(candidate, device)
+            if identifier is None:
+                return
+        found[identifier] = device
+        seen.add(device.address)
+        pending.remove(identifier)
+        if not pending:
+            done.set()
+
+    if pending is not None and not pending:
+        return found
+
+    async with BleakScanner(detection_callback=detection_callback):
+        try:
+            await asyncio.wait_for(done.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    for identifier, device in fallbacks.items():
+        if identifier in pending and device.address not in seen:
+            found[identifier] = device
+            seen.add(device.address)
+            pending.remove(identifier)
+    return found
+
+
+async def connect_all(
+    identifiers: Iterable[str],
+    cache: Optional[AddressCache] = None,
+    data_callback: Callable[[Union[constants.ECGData, constants.ACCData]], None] = None,
+    heartrate_callback: Callable[[constants.HRData], None] = None,
+    scan_timeout: float = DEFAULT_SCAN_TIMEOUT,
+    connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+) -> Dict[str, PolarDevice]:
+    """
+    Connect to many Polar devices concurrently.
+
+    One shared scan resolves every device: those with a cached address are
+    matched by address, and the rest by name. The scan stops as soon as all of
+    them are seen, which is near-instant for advertising straps with a cached
+    address. The devices found are connected to concurrently, and their
+    addresses are written back to the cache.
+
+    Devices are always resolved by scanning rather than by passing a cached
+    address string to ``BleakClient``, since every Bleak backend then runs its
+    own ``BleakScanner.find_device_by_address`` scan for each device.
+
+    :param identifiers: Identifiers of the devices, as matched by ``discover``.
+    :param cache: Address cache to use, defaults to the cache at the default path.
+    :param data_callback: Callback function to handle data streams.
+    :param heartrate_callback: Callback function to handle heart rate data.
+    :param scan_timeout: Maximum number of seconds to scan.
+    :param connect_timeout: Seconds to wait for a connection to each device.
+    :return: The connected devices, keyed by identifier. Devices that could not
+        be found or connected to are left out.
+    """
+    identifiers = list(dict.fromkeys(identifiers))
+    cache = AddressCache() if cache is None else cache
+
+    async def attempt(ble_device: BLEDevice) -> Optional[PolarDevice]:
+        device = PolarDevice(
+            ble_device,
+            data_callback,
+            heartrate_callback,
+            client=BleakClient(ble_device, timeout=connect_timeout),
+        )
+        try:
+            await device.connect()
+        except exceptions.ConnectionError:
+            # Connecting may have succeeded before subscribing failed, and a
+            # connected strap stops advertising until it is disconnected
+            try:
+                await device.client.disconnect()
+            except Exception:
+                pass
+            return None
+        return device
+
+    found = await discover(
+        identifiers,
+        scan_timeout,
+        {
+            identifier: cache.get(identifier)
+            for identifier in identifiers
+            if identifier in cache
+        },
+    )
+    devices: List[Optional[PolarDevice]] = await asyncio.gather(
+        *(attempt(ble_device) for ble_device in found.values())
+    )
+    connected = {
+        identifier: device
+        for identifier, device in zip(found, devices)
+        if device is not None
+    }
+
+    for identifier, device in connected.items():
+        cache.set(identifier, device.client.address)
+    if connected:
+        cache.save()
+    return {
+        identifier: connected[identifier]
+        for identifier in identifiers
+        if identifier in connected
+    }
+
+
+async def connect(
+    identifier: str,
+    cache: Optional[AddressCache] = None,
+    data_callback: Callable[[Union[constants.ECGData, constants.ACCData]], None] = None,
+    heartrate_callback: Callable[[constants.HRData], None] = None,
+    scan_timeout: float = DEFAULT_SCAN_TIMEOUT,
+    connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+) -> PolarDevice:
+    """
+    Connect to a Polar device, resolving it by its cached address or its name.
+
+    :raises exceptions.ConnectionError: If the device cannot be found or connected to.
+    """
+    devices = await connect_all(
+        [identifier],
+        cache,
+        data_callback,
+        heartrate_callback,
+        scan_timeout,
+        connect_timeout,
+    )
+    if identifier not in devices:
+        raise exceptions.ConnectionError(
+            f"Failed to find or connect to the Polar device: {identifier}"
+        )
+    return devices[identifier]
@@ -0,0 +1,379 @@
+import logging
+import os
+import re
+import time
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from . import constants, utils
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    ds = None
+    pq = None
+
+logger = logging.getLogger(__name__)
+
+# Rows buffered per measurement type before a row group is written
+DEFAULT_ROW_GROUP_SIZE: int = 65536
+
+# Frame spacings beyond this many expected spacings are treated as lost frames
+FRAME_GAP_TOLERANCE: float = 1.5
+
+# Frame spacings observed before a derived sample interval is used
+MIN_FRAME_SPACINGS: int = 3
+
+# Frames buffered per stream while its sample interval is being derived
+MAX_PENDING_FRAMES: int = 16
+
+# Characters replaced in device IDs to form portable file names
+UNSAFE_FILE_NAME_CHARACTERS = re.compile(r'[<>:"/\\|?*\x00-\x1f]')
+
+Frame = Union[constants.ECGData, constants.ACCData, constants.HRData]
+
+
+def _require_pyarrow() -> None:
+    """Raise an ImportError if pyarrow is not installed."""
+    if pa is None:
+        raise ImportError(
+            "pyarrow is required for columnar export, "
+            "install it with `pip install polar-python[parquet]`"
+        )
+
+
+def _schemas() -> Dict[str, "pa.Schema"]:
+    """Return the Arrow schema for each exported measurement type."""
+    device_id = pa.field("device_id", pa.dictionary(pa.int32(), pa.string()))
+    timestamp = pa.field("timestamp", pa.timestamp("ns", tz="UTC"))
+    host_timestamp = pa.field("host_timestamp", pa.timestamp("ns", tz="UTC"))
+    return {
+        "ECG": pa.schema(
+            [device_id, timestamp, host_timestamp, pa.field("value", pa.int32())]
+        ),
+        "ACC": pa.schema(
+            [
+                device_id,
+                timestamp,
+                host_timestamp,
+                pa.field("x", pa.int32()),
+                pa.field("y", pa.int32()),
+                pa.field("z", pa.int32()),
+            ]
+        ),
+        "HR": pa.schema(
+            [
+                device_id,
+                timestamp,
+                pa.field("heartrate", pa.int16()),
+                pa.field("rr_intervals", pa.list_(pa.float64())),
+            ]
+        ),
+    }
+
+
+def sample_timestamps(timestamp: int, count: int, interval: float) -> List[int]:
+    """
+    Spread a frame timestamp across its samples.
+
+    Polar frames carry the timestamp of their last sample, so earlier samples
+    are placed one sample interval, in nanoseconds, apart before it.
+    """
+    last = count - 1
+    return [timestamp - int((last - i) * interval) for i in range(count)]
+
+
+class ParquetSink:
+    def __init__(
+        self,
+        root: str,
+        device_id: str,
+        row_group_size: int = DEFAULT_ROW_GROUP_SIZE,
+        sample_rates: Optional[Dict[str, int]] = None,
+    ) -> None:
+        """
+        Initialize a streaming Parquet writer for one device.
+
+        Each measurement type is written to ``<root>/<type>/<device_id>.parquet``
+        so that a whole session can be scanned as one dataset per type.
+
+        Unless a sample rate is given for a stream, its sample interval is derived
+        from the timestamps of consecutive frames, so the first frames of a stream
+        are buffered until enough of them have arrived. If the interval cannot be
+        derived, samples are placed at their frame timestamp and a warning is logged.
+
+        :param root: Directory the session is written to.
+        :param device_id: Identifier stored in the ``device_id`` column. Characters
+            that are not allowed in file names, such as ``:``, are replaced by
+            ``_`` in the file name.
+        :param row_group_size: Number of rows buffered before a row group is written.
+        :param sample_rates: Sample rate per measurement type, in Hz, such as
+            ``{"ACC": 200}``, for streams whose interval should not be derived.
+        """
+        _require_pyarrow()
+        self.root = root
+        self.device_id = device_id
+        self.row_group_size = row_group_size
+        self.sample_rates = dict(sample_rates) if sample_rates else {}
+        self._schemas = _schemas()
+        self._columns: Dict[str, Dict[str, list]] = {
+            measurement_type: {name: [] for name in schema.names[1:]}
+            for measurement_type, schema in self._schemas.items()
+        }
+        self._writers: Dict[str, "pq.ParquetWriter"] = {}
+        self._paths: List[str] = []
+        self._last_timestamps: Dict[str, int] = {}
+        self._intervals: Dict[str, float] = {}
+        self._spacings: Dict[str, int] = {}
+        self._pending: Dict[str, list] = {}
+        self._warned: set = set()
+
+    def __call__(self, data: Frame) -> None:
+        """Write a frame, allowing the sink to be used as a PolarDevice callback."""
+        self.write(data)
+
+    def __enter__(self):
+        """Support for context management."""
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """Support for context management."""
+        if exc_type is None:
+            self.close()
+            return
+        # Keep the exception in flight rather than replacing it
+        try:
+            self.close()
+        except Exception:
+            logger.exception("Failed to close Parquet files of %s", self.device_id)
+
+    @property
+    def paths(self) -> List[str]:
+        """Paths of the files written so far."""
+        return list(self._paths)
+
+    def write(self, data: Frame, received_at: Optional[int] = None) -> None:
+        """
+        Buffer a decoded frame and flush full row groups.
+
+        :param data: ECG, ACC or heart rate data from a PolarDevice.
+        :param received_at: Host receive time in nanoseconds, used for heart rate
+            data which carries no device timestamp. Defaults to the frame's host
+            timestamp, or the current time.
+        """
+        if isinstance(data, constants.ECGData):
+            self._write_samples("ECG", data)
+        elif isinstance(data, constants.ACCData):
+            self._write_samples("ACC", data)
+        elif isinstance(data, constants.HRData):
+            columns = self._columns["HR"]
+            if received_at is None:
+                received_at = data.host_timestamp or time.time_ns()
+            columns["timestamp"].append(received_at)
+            columns["heartrate"].append(data.heartrate)
+            columns["rr_intervals"].append(data.rr_intervals)
+            self._maybe_flush("HR")
+        else:
+            raise ValueError(f"Unsupported data type: {type(data).__name__}")
+
+    def flush(self) -> None:
+        """Write all buffered rows, even if a row group is not yet full."""
+        for measurement_type, columns in self._columns.items():
+            self._flush(measurement_type, len(columns["timestamp"]))
+
+    def close(self) -> None:
+        """Write buffered frames and rows, and close all open files."""
+        for measurement_type in list(self._pending):
+            self._release_pending(measurement_type)
+        self.flush()
+        for writer in self._writers.values():
+            writer.close()
+        self._writers.clear()
+
+    def _write_samples(
+        self,
+        measurement_type: str,
+        data: Union[constants.ECGData, constants.ACCData],
+    ) -> None:
+        """Buffer an ECG or ACC frame once its sample interval is known."""
+        if not data.data:
+            return
+
+        sample_rate = self.sample_rates.get(measurement_type)
+        if sample_rate:
+            self._append_samples(measurement_type, data, 1_000_000_000 / sample_rate)
+            return
+
+        self._pending.setdefault(measurement_type, []).append(data)
+        last_timestamp = self._last_timestamps.get(measurement_type)
+        self._last_timestamps[measurement_type] = data.timestamp
+        interval = self._intervals.get(measurement_type)
+        spacings = self._spacings.get(measurement_type, 0)
+        if last_timestamp is not None and data.timestamp > last_timestamp:
+            candidate = (data.timestamp - last_timestamp) / len(data.data)
+            spacings += 1
+            if interval is None:
+                interval = candidate
+            elif spacings <= MIN_FRAME_SPACINGS:
+                # The first spacings may span lost frames, keep the shortest
+                interval = min(interval, candidate)
+            elif candidate <= interval * FRAME_GAP_TOLERANCE:
+                # A longer spacing than expected means frames were lost in between
+                interval = candidate
+            self._intervals[measurement_type] = interval
+            self._spacings[measurement_type] = spacings
+
+        if spacings >= MIN_FRAME_SPACINGS:
+            self._append_pending(measurement_type, interval)
+        elif len(self._pending[measurement_type]) >= MAX_PENDING_FRAMES:
+            # Timestamps that do not advance would otherwise buffer forever
+            self._release_pending(measurement_type)
+
+    def _append_pending(self, measurement_type: str, interval: float) -> None:
+        pending = self._pending.get(measurement_type, [])
+        for frame in pending:
+            self._append_samples(measurement_type, frame, interval)
+        pending.clear()
+
+    def _release_pending(self, measurement_type: str) -> None:
+        """Write buffered frames with the best interval known so far."""
+        if not self._pending.get(measurement_type):
+            return
+        interval = self._intervals.get(measurement_type)
+        if interval is None:
+            interval = 0.0
+            if measurement_type not in self._warned:
+                self._warned.add(measurement_type)
+                logger.warning(
+                    "Could not derive the %s sample interval of %s, placing its "
+                    "samples at their frame timestamp; pass sample_rates to fix it",
+                    measurement_type,
+                    self.device_id,
+                )
+        self._append_pending(measurement_type, interval)
+
+    def _append_samples(
+        self,
+        measurement_type: str,
+        data: Union[constants.ECGData, constants.ACCData],
+        interval: float,
+    ) -> None:
+        columns = self._columns[measurement_type]
+        count = len(data.data)
+        columns["timestamp"].extend(sample_timestamps(data.timestamp, count, interval))
+        if data.host_timestamp is None:
+            columns["host_timestamp"].extend([None] * count)
+        else:
+            columns["host_timestamp"].extend(
+                sample_timestamps(data.host_timestamp, count, interval)
+            )
+        if measurement_type == "ECG":
+            columns["value"].extend(data.data)
+        else:
+            for x, y, z in data.data:
+                columns["x"].append(x)
+                columns["y"].append(y)
+                columns["z"].append(z)
+        self._maybe_flush(measurement_type)
+
+    def _path(self, measurement_type: str) -> str:
+        file_name = UNSAFE_FILE_NAME_CHARACTERS.sub("_", self.device_id)
+        return os.path.join(self.root, measurement_type, f"{file_name}.parquet")
+
+    def _maybe_flush(self, measurement_type: str) -> None:
+        length = len(self._columns[measurement_type]["timestamp"])
+        if length >= self.row_group_size:
+            self._flush(measurement_type, length - length % self.row_group_size)
+
+    def _flush(self, measurement_type: str, length: int) -> None:
+        """Write the first ``length`` buffered rows and keep the remainder."""
+        if length == 0:
+            return
+
+        columns = self._columns[measurement_type]
+        schema = self._schemas[measurement_type]
+        arrays = [
+            pa.DictionaryArray.from_arrays(
+                pa.array([0] * length, type=pa.int32()), pa.array([self.device_id])
+            )
+        ]
+        arrays.extend(
+            pa.array(columns[name][:length], type=schema.field(name).type)
+            for name in schema.names[1:]
+        )
+        table = pa.Table.from_arrays(arrays, schema=schema)
+
+        writer = self._writers.get(measurement_type)
+        if writer is None:
+            path = self._path(measurement_type)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            writer = pq.ParquetWriter(path, schema)
+            self._writers[measurement_type] = writer
+            self._paths.append(path)
+        writer.write_table(table, row_group_size=self.row_group_size)
+
+        for values in columns.values():
+            del values[:length]
+
+
+def convert_session(
+    frames: Iterable[Union[Frame, bytes, bytearray, Tuple[int, Frame]]],
+    root: str,
+    device_id: str,
+    row_group_size: int = DEFAULT_ROW_GROUP_SIZE,
+    sample_rates: Optional[Dict[str, int]] = None,
+) -> List[str]:
+    """
+    Convert a captured session to Parquet in one pass.
+
+    Frames may be decoded ECG/ACC/HR data, raw PMD data notifications, or
+    ``(received_at, frame)`` tuples carrying the host receive time in nanoseconds.
+
+    :return: Paths of the files written.
+    """
+    with ParquetSink(root, device_id, row_group_size, sample_rates) as sink:
+        for frame in frames:
+            received_at = None
+            if isinstance(frame, tuple):
+                received_at, frame = frame
+            if isinstance(frame, (bytes, bytearray)):
+                frame = utils.parse_bluetooth_data(frame)
+            sink.write(frame, received_at)
+    return sink.paths
+
+
+def read_session(
+    root: str,
+    measurement_type: str,
+    device_ids: Optional[List[str]] = None,
+    columns: Optional[List[str]] = None,
+) -> "pa.Table":
+    """
+    Read one measurement type of a session, across all devices, as a single scan.
+
+    :param root: Directory the session was written to.
+    :param measurement_type: One of ``"ECG"``, ``"ACC"`` or ``"HR"``.
+    :param device_ids: Only read rows from these devices.
+    :param columns: Only read these columns.
+    :return: The rows read, or an empty table if the type was never written.
+    :raises ValueError: If the measurement type is not supported.
+    """
+    _require_pyarrow()
+    schemas = _schemas()
+    if measurement_type not in schemas:
+        raise ValueError(
+            f"Unsupported measurement type: {measurement_type}, "
+            f"expected one of {', '.join(schemas)}"
+        )
+    schema = schemas[measurement_type]
+    directory = os.path.join(root, measurement_type)
+    if not os.path.isdir(directory):
+        table = schema.empty_table()
+        return table if columns is None else table.select(columns)
+    dataset = ds.dataset(directory, schema=schema, format="parquet")
+    expression = None
+    if device_ids is not None:
+        expression = ds.field("device_id").isin(device_ids)
+    return dataset.to_table(columns=columns, filter=expression)
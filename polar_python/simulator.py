@@ -0,0 +1,408 @@
+import asyncio
+import math
+import random
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from . import constants
+
+# Response code prefixing PMD control point notifications
+PMD_CONTROL_POINT_RESPONSE: int = 0xF0
+
+# Feature read response code of the PMD control point
+PMD_FEATURE_READ: int = 0x0F
+
+# Stream settings reported by a simulated Polar H10
+DEFAULT_STREAM_SETTINGS: Dict[str, List[constants.SettingType]] = {
+    "ECG": [
+        constants.SettingType(type="SAMPLE_RATE", array_length=1, values=[130]),
+        constants.SettingType(type="RESOLUTION", array_length=1, values=[14]),
+    ],
+    "ACC": [
+        constants.SettingType(
+            type="SAMPLE_RATE", array_length=4, values=[25, 50, 100, 200]
+        ),
+        constants.SettingType(type="RESOLUTION", array_length=1, values=[16]),
+        constants.SettingType(type="RANGE", array_length=3, values=[2, 4, 8]),
+    ],
+}
+
+# Samples per PMD data notification
+DEFAULT_SAMPLES_PER_FRAME: Dict[str, int] = {"ECG": 73, "ACC": 36}
+
+# ACC frame type for each resolution
+ACC_FRAME_TYPES: Dict[int, int] = {8: 0x00, 16: 0x01, 24: 0x02}
+
+# Bytes per sample for each ACC frame type
+ACC_SAMPLE_SIZES: Dict[int, int] = {0x00: 1, 0x01: 2, 0x02: 3}
+
+
+@dataclass
+class SimulatedCharacteristic:
+    """Stand-in for the characteristic passed to notification callbacks."""
+
+    uuid: str
+
+
+def build_ecg_frame(timestamp: int, samples: Sequence[int]) -> bytearray:
+    """Build a PMD data notification carrying ECG samples."""
+    data = bytearray([constants.PMD_MEASUREMENT_TYPES.index("ECG")])
+    data.extend((timestamp - constants.TIMESTAMP_OFFSET).to_bytes(8, "little"))
+    data.append(0x00)
+    for sample in samples:
+        data.extend(sample.to_bytes(3, "little", signed=True))
+    return data
+
+
+def build_acc_frame(
+    timestamp: int, samples: Sequence[Tuple[int, int, int]], frame_type: int = 0x01
+) -> bytearray:
+    """Build a PMD data notification carrying accelerometer samples."""
+    size = ACC_SAMPLE_SIZES[frame_type]
+    data = bytearray([constants.PMD_MEASUREMENT_TYPES.index("ACC")])
+    data.extend((timestamp - constants.TIMESTAMP_OFFSET).to_bytes(8, "little"))
+    data.append(frame_type)
+    for sample in samples:
+        for axis in sample:
+            data.extend(axis.to_bytes(size, "little", signed=True))
+    return data
+
+
+def build_heartrate_data(heartrate: int, rr_intervals: Sequence[float]) -> bytearray:
+    """Build a heart rate measurement notification with RR intervals in milliseconds."""
+    data = bytearray([0x10, heartrate])
+    for rr_interval in rr_intervals:
+        data.extend(round(rr_interval / 1000.0 * 1024.0).to_bytes(2, "little"))
+    return data
+
+
+def build_pmd_response(
+    op_code: int,
+    measurement_type_index: int,
+    error_code: str = "SUCCESS",
+    settings: Sequence[constants.SettingType] = (),
+) -> bytearray:
+    """Build a PMD control point response notification."""
+    data = bytearray(
+        [
+            PMD_CONTROL_POINT_RESPONSE,
+            op_code,
+            measurement_type_index,
+            constants.PMD_CONTROL_POINT_ERROR_CODES.index(error_code),
+            0x00,
+        ]
+    )
+    for setting in settings:
+        data.append(constants.PMD_SETTING_TYPES.index(setting.type))
+        data.append(setting.array_length)
+        for value in setting.values:
+            data.extend(value.to_bytes(2, "little"))
+    return data
+
+
+def ecg_waveform(sample_rate: int, heartrate: int) -> List[int]:
+    """Return one synthetic heartbeat of ECG samples, in microvolts."""
+    length = max(1, round(sample_rate * 60 / heartrate))
+    waveform = []
+    for i in range(length):
+        t = i / sample_rate
+        r_wave = 1200 * math.exp(-(((t - 0.20) / 0.012) ** 2))
+        t_wave = 250 * math.exp(-(((t - 0.45) / 0.050) ** 2))
+        waveform.append(int(r_wave + t_wave))
+    return waveform
+
+
+class SimulatedClient:
+    def __init__(
+        self,
+        address: str = "00:00:00:00:00:00",
+        stream_settings: Optional[Dict[str, List[constants.SettingType]]] = None,
+        samples_per_frame: Optional[Dict[str, int]] = None,
+        heartrate: int = 60,
+        clock_offset: int = 0,
+        clock_drift: float = 0.0,
+        jitter: float = 0.0,
+        loss: float = 0.0,
+        seed: Optional[int] = None,
+    ) -> None:
+        """
+        Initialize a simulated Polar device that stands in for a BleakClient.
+
+        :param address: Address reported by the simulated device.
+        :param stream_settings: Settings reported for each supported measurement type.
+        :param samples_per_frame: Samples per data notification for each measurement type.
+        :param heartrate: Simulated heart rate in beats per minute.
+        :param clock_offset: Offset of the device clock from host time, in nanoseconds.
+        :param clock_drift: Drift of the device clock, in parts per million.
+        :param jitter: Maximum extra delay of each notification, in seconds.
+        :param loss: Probability of a data notification being dropped.
+        :param seed: Seed of the random generator used for jitter, loss and noise.
+        """
+        self.address = address
+        self.stream_settings = (
+            DEFAULT_STREAM_SETTINGS if stream_settings is None else stream_settings
+        )
+        self.samples_per_frame = dict(DEFAULT_SAMPLES_PER_FRAME)
+        if samples_per_frame:
+            self.samples_per_frame.update(samples_per_frame)
+        self.heartrate = heartrate
+        self.clock_offset = clock_offset
+        self.clock_drift = clock_drift
+        self.jitter = jitter
+        self.loss = loss
+        self.notifications_sent = 0
+        self.notifications_dropped = 0
+        self._random = random.Random(seed)
+        self._epoch = time.time_ns()
+        self._connected = False
+        self._callbacks: Dict[str, Callable] = {}
+        self._streams: Dict[str, asyncio.Task] = {}
+
+    @property
+    def is_connected(self) -> bool:
+        """Whether the simulated device is connected."""
+        return self._connected
+
+    async def connect(self, **kwargs) -> bool:
+        """Connect to the simulated device."""
+        self._connected = True
+        return True
+
+    async def disconnect(self) -> bool:
+        """Disconnect from the simulated device and stop all streams."""
+        for task in self._streams.values():
+            task.cancel()
+        await asyncio.gather(*self._streams.values(), return_exceptions=True)
+        self._streams.clear()
+        self._callbacks.clear()
+        self._connected = False
+        return True
+
+    async def start_notify(self, char_specifier: str, callback: Callable) -> None:
+        """Subscribe to notifications of a characteristic."""
+        self._ensure_connected()
+        uuid = char_specifier.lower()
+        self._callbacks[uuid] = callback
+        if uuid == constants.HEART_RATE_CHAR_UUID:
+            self._start_task(uuid, self._heartrate_stream())
+
+    async def stop_notify(self, char_specifier: str) -> None:
+        """Unsubscribe from notifications of a characteristic."""
+        self._ensure_connected()
+        uuid = char_specifier.lower()
+        self._callbacks.pop(uuid, None)
+        await self._stop_task(uuid)
+
+    async def read_gatt_char(self, char_specifier: str, **kwargs) -> bytearray:
+        """Read a characteristic, answering the PMD control point feature read."""
+        self._ensure_connected()
+        if char_specifier.lower() != constants.PMD_CONTROL_POINT_UUID.lower():
+            raise ValueError(f"Characteristic {char_specifier} cannot be read")
+        features = 0
+        for measurement_type in self.stream_settings:
+            features |= 1 << constants.PMD_MEASUREMENT_TYPES.index(measurement_type)
+        return bytearray([PMD_FEATURE_READ, features, 0x00])
+
+    async def write_gatt_char(
+        self, char_specifier: str, data: bytearray, response: bool = None
+    ) -> None:
+        """Write a characteristic, handling PMD control point commands."""
+        self._ensure_connected()
+        if char_specifier.lower() != constants.PMD_CONTROL_POINT_UUID.lower():
+            raise ValueError(f"Characteristic {char_specifier} cannot be written")
+        op_code, measurement_type_index = data[0], data[1]
+        response = await self._handle_control_point(
+            op_code, measurement_type_index, bytes(data[2:])
+        )
+        self._notify(constants.PMD_CONTROL_POINT_UUID, response)
+
+    async def _handle_control_point(
+        self, op_code: int, measurement_type_index: int, payload: bytes
+    ) -> bytearray:
+        operations = constants.PMD_CONTROL_OPERATION_CODE
+        measurement_type = (
+            constants.PMD_MEASUREMENT_TYPES[measurement_type_index]
+            if measurement_type_index < len(constants.PMD_MEASUREMENT_TYPES)
+            else None
+        )
+        if op_code not in operations.values():
+            return build_pmd_response(
+                op_code, measurement_type_index, "ERROR INVALID OP CODE"
+            )
+        if measurement_type is None:
+            return build_pmd_response(
+                op_code, measurement_type_index, "ERROR INVALID MEASUREMENT TYPE"
+            )
+        if measurement_type not in self.stream_settings:
+            return build_pmd_response(
+                op_code, measurement_type_index, "ERROR NOT SUPPORTED"
+            )
+
+        if op_code == operations["GET"]:
+            return build_pmd_response(
+                op_code,
+                measurement_type_index,
+                settings=self.stream_settings[measurement_type],
+            )
+
+        if op_code == operations["STOP"]:
+            if measurement_type not in self._streams:
+                return build_pmd_response(
+                    op_code, measurement_type_index, "ERROR INVALID STATE"
+                )
+            await self._stop_task(measurement_type)
+            return build_pmd_response(op_code, measurement_type_index)
+
+        if measurement_type in self._streams:
+            return build_pmd_response(
+                op_code, measurement_type_index, "ERROR ALREADY IN STATE"
+            )
+        try:
+            requested = self._parse_start_settings(payload)
+        except (IndexError, ValueError):
+            return build_pmd_response(
+                op_code, measurement_type_index, "ERROR INVALID PARAMETER"
+            )
+        error_code = self._validate_settings(measurement_type, requested)
+        if error_code != "SUCCESS":
+            return build_pmd_response(op_code, measurement_type_index, error_code)
+
+        if measurement_type == "ECG":
+            stream = self._ecg_stream(requested["SAMPLE_RATE"])
+        else:
+            stream = self._acc_stream(
+                requested["SAMPLE_RATE"],
+                ACC_FRAME_TYPES.get(requested.get("RESOLUTION", 16), 0x01),
+            )
+        self._start_task(measurement_type, stream)
+        return build_pmd_response(op_code, measurement_type_index)
+
+    @staticmethod
+    def _parse_start_settings(payload: bytes) -> Dict[str, int]:
+        requested = {}
+        index = 0
+        while index < len(payload):
+            setting_type = constants.PMD_SETTING_TYPES[payload[index]]
+            array_length = payload[index + 1]
+            if array_length != 1 or index + 4 > len(payload):
+                raise ValueError("Expected a single value per setting")
+            requested[setting_type] = int.from_bytes(
+                payload[index + 2 : index + 4], "little"
+            )
+            index += 2 + 2 * array_length
+        return requested
+
+    def _validate_settings(
+        self, measurement_type: str, requested: Dict[str, int]
+    ) -> str:
+        supported = {
+            setting.type: setting.values
+            for setting in self.stream_settings[measurement_type]
+        }
+        if "SAMPLE_RATE" not in requested:
+            return "ERROR INVALID PARAMETER"
+        errors = {
+            "SAMPLE_RATE": "ERROR INVALID SAMPLE RATE",
+            "RESOLUTION": "ERROR INVALID RESOLUTION",
+            "RANGE": "ERROR INVALID RANGE",
+        }
+        for setting_type, value in requested.items():
+            if setting_type not in supported:
+                return "ERROR INVALID PARAMETER"
+            if value not in supported[setting_type]:
+                return errors.get(setting_type, "ERROR INVALID PARAMETER")
+        return "SUCCESS"
+
+    def _device_time(self, host_time: int) -> int:
+        """Convert host time to the drifting device clock, in nanoseconds."""
+        elapsed = host_time - self._epoch
+        return host_time + self.clock_offset + int(elapsed * self.clock_drift * 1e-6)
+
+    def _ensure_connected(self) -> None:
+        if not self._connected:
+            raise RuntimeError(f"Simulated device {self.address} is not connected")
+
+    def _start_task(self, key: str, coroutine) -> None:
+        self._streams[key] = asyncio.get_running_loop().create_task(coroutine)
+
+    async def _stop_task(self, key: str) -> None:
+        task = self._streams.pop(key, None)
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    def _notify(self, uuid: str, data: bytearray) -> None:
+        callback = self._callbacks.get(uuid.lower())
+        if callback is not None:
+            callback(SimulatedCharacteristic(uuid), data)
+
+    async def _emit(self, deadline: float, uuid: str, data: bytearray) -> None:
+        """Deliver a notification at its deadline, applying jitter and loss."""
+        loop = asyncio.get_running_loop()
+        if self.jitter:
+            deadline += self._random.uniform(0.0, self.jitter)
+        delay = deadline - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if self.loss and self._random.random() < self.loss:
+            self.notifications_dropped += 1
+            return
+        self.notifications_sent += 1
+        self._notify(uuid, data)
+
+    async def _frames(
+        self, sample_rate: int, samples_per_frame: int, build: Callable
+    ) -> None:
+        """Emit frames on a fixed sample clock, stamped with their last sample time."""
+        loop = asyncio.get_running_loop()
+        start_time = loop.time()
+        start_timestamp = self._device_time(time.time_ns())
+        interval = 1_000_000_000 / sample_rate * (1.0 + self.clock_drift * 1e-6)
+        sent = 0
+        while True:
+            sent += samples_per_frame
+            timestamp = start_timestamp + int((sent - 1) * interval)
+            await self._emit(
+                start_time + sent / sample_rate,
+                constants.PMD_DATA_UUID,
+                build(timestamp, sent - samples_per_frame, samples_per_frame),
+            )
+
+    async def _ecg_stream(self, sample_rate: int) -> None:
+        waveform = ecg_waveform(sample_rate, self.heartrate)
+
+        def build(timestamp: int, first: int, count: int) -> bytearray:
+            samples = [
+                waveform[i % len(waveform)] + self._random.randint(-10, 10)
+                for i in range(first, first + count)
+            ]
+            return build_ecg_frame(timestamp, samples)
+
+        await self._frames(sample_rate, self.samples_per_frame["ECG"], build)
+
+    async def _acc_stream(self, sample_rate: int, frame_type: int) -> None:
+        gravity = min(1000, 2 ** (8 * ACC_SAMPLE_SIZES[frame_type] - 1) - 1)
+
+        def build(timestamp: int, first: int, count: int) -> bytearray:
+            noise = self._random.randint
+            samples = [
+                (noise(-5, 5), noise(-5, 5), gravity + noise(-5, 5))
+                for _ in range(count)
+            ]
+            return build_acc_frame(timestamp, samples, frame_type)
+
+        await self._frames(sample_rate, self.samples_per_frame["ACC"], build)
+
+    async def _heartrate_stream(self) -> None:
+        loop = asyncio.get_running_loop()
+        start_time = loop.time()
+        rr_interval = 60000.0 / self.heartrate
+        beats = 0
+        while True:
+            beats += 1
+            await self._emit(
+                start_time + beats * rr_interval / 1000.0,
+                constants.HEART_RATE_CHAR_UUID,
+                build_heartrate_data(self.heartrate, [rr_interval]),
+            )
@@ -8,6 +8,7 @@ setup(
     version="0.0.4",
     packages=find_packages(),
     install_requires=["bleak"],
+    extras_require={"parquet": ["pyarrow"]},
     author="Zhe_Learn",
     author_email="personal@zhelearn.com",
     description=(